@@ -3,7 +3,7 @@
 """Puzzle 15 Module
 
 For use with the branch and bound algorithm
-with offset-tile heuristic.
+with Manhattan distance and linear conflict heuristic.
 
 Notes
 -----
@@ -12,9 +12,10 @@ a randomly generated Puzzle 15 problem.
 """
 from __future__ import annotations
 from typing import Callable, TypeVar
+from array import array
 from enum import Enum
+from functools import lru_cache
 import random
-import re
 import sys
 
 
@@ -34,12 +35,127 @@ class Move(Enum):
     LEFT = 'Left'
 
 
+# internally, moves are integers indexing MOVES, so the
+# opposite of move k is k ^ 2
+MOVES = tuple(Move)
+MOVEINDEX = {m: k for k, m in enumerate(MOVES)}
+
+# row and column deltas of the null tile, indexed by move
+DELTAS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+
+@lru_cache(maxsize=None)
+def defaultGoal(size: int, null: T) -> tuple[tuple[T, ...], ...]:
+    """Get the goal of sorted integer tiles, null on the bottom right.
+
+    Shared by all puzzles of the same size and null element, so it
+    must never be mutated.
+    """
+    goal = [[i * size + j + 1 for j in range(size)] for i in range(size)]
+    goal[-1][-1] = null
+    return tuple(tuple(row) for row in goal)
+
+
+@lru_cache(maxsize=None)
+def moveTable(size: int) -> tuple[tuple[int, ...], ...]:
+    """Get the cell the null tile moves to, indexed by [cell][move].
+
+    Cells are flat indices i * size + j. Impossible moves are
+    denoted by -1.
+    """
+    table = []
+    for k in range(size * size):
+        i, j = divmod(k, size)
+        table.append(tuple(
+            (i + di) * size + j + dj
+            if 0 <= i + di < size and 0 <= j + dj < size else -1
+            for di, dj in DELTAS
+        ))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def neighborTable(size: int) -> tuple[tuple[tuple[int, int], ...], ...]:
+    """Get the possible (move, new null cell) pairs, indexed by cell."""
+    return tuple(
+        tuple((m, nk) for m, nk in enumerate(row) if nk >= 0)
+        for row in moveTable(size)
+    )
+
+
+@lru_cache(maxsize=None)
+def distanceTable(size: int) -> tuple[tuple[int, ...], ...]:
+    """Get the Manhattan distance between two cells, indexed by [cell][cell].
+
+    As tiles are coded by their goal index, [code][cell] is the
+    distance of a tile on that cell to its goal position.
+    """
+    return tuple(
+        tuple(
+            abs(a // size - b // size) + abs(a % size - b % size)
+            for b in range(size * size)
+        ) for a in range(size * size)
+    )
+
+
+@lru_cache(maxsize=None)
+def lineKeyTable(
+    size: int, null: int
+) -> tuple[tuple[tuple[int, ...], ...], ...]:
+    """Get the goal position within a line of a tile in its goal line.
+
+    Indexed by [column][line][code], where column is whether the
+    line is a column. -1 if the tile's goal is in another line, or
+    it is the null tile.
+    """
+    def key(column: bool, line: int, code: int) -> int:
+        i, j = divmod(code, size)
+        if code == null or (j if column else i) != line:
+            return -1
+        return i if column else j
+
+    return tuple(
+        tuple(
+            tuple(key(column, line, code) for code in range(size * size))
+            for line in range(size)
+        ) for column in (False, True)
+    )
+
+
+@lru_cache(maxsize=None)
+def orderConflicts(keys: tuple[int, ...]) -> int:
+    """Count the extra moves forced by linear conflicts in a line.
+
+    Two tiles are in linear conflict if both are in their goal line
+    but in reversed order, so one of them has to leave the line and
+    come back, costing two more moves than the Manhattan distance.
+    Tiles off the longest correctly ordered sequence all have to.
+
+    Parameters
+    ----------
+    keys : tuple of int
+        Goal positions within the line of its tiles which are in
+        their goal line, in the order they are placed. These are
+        distinct and less than the size, so only a few such tuples
+        exist per size, which keeps the cache small.
+    """
+    # longest increasing subsequence of goal positions
+    longest = [1] * len(keys)
+    for a in range(len(keys)):
+        for b in range(a):
+            if keys[b] < keys[a] and longest[b] >= longest[a]:
+                longest[a] = longest[b] + 1
+
+    return 2 * (len(keys) - max(longest, default=0))
+
+
 class Puzzle:
     """Puzzle 15 Class
 
     Class to represent Puzzle 15, mainly for use with the
-    Branch and Bound Algorithm with the simple heuristic of
-    counting the number of offset tiles.
+    Branch and Bound Algorithm with the heuristic of summing
+    the Manhattan distance of every tile to its goal position,
+    plus two moves for every tile in linear conflict.
 
     Notes
     -----
@@ -49,6 +165,10 @@ class Puzzle:
     the method cost(). The class also provides comparison
     overloading, for use within a prio-queue.
 
+    The heuristic is maintained incrementally, i.e. each move only
+    updates the contribution of the sliding tile and the two lines
+    it affects, so cost() runs in constant time.
+
     Reference:
     `R. Munir et al <https://informatika.stei.itb.ac.id/~rinaldi.munir/Stmik/2020-2021/Algoritma-Branch-and-Bound-2021-Bagian1.pdf>`
 
@@ -86,32 +206,89 @@ class Puzzle:
     null: T
         The element representing Null Tile. Preferably same type as
         other elements. Default is 0. Readonly.
+    size: int
+        Size of the puzzle. Readonly.
     history: list of Move
         List of executed moves. Readonly.
+    packed: int
+        The state of the puzzle packed into a single integer, where the
+        cell at flat index k holds the goal index of its tile at bits
+        [k * b, (k + 1) * b). b is 4 for up to 16 cells (so a 4x4
+        puzzle fits in 64 bits), and grows as needed for bigger ones.
+        Suitable as a hashable key of the state. Readonly.
     """
-    _grid: list[list[T@__init__]]
+    __slots__ = (
+        '_grid', '_size', '_null', '_goal', '_elements', '_index',
+        '_code', '_bits', '_packed', '_goalPacked', '_nullCode',
+        '_nullIdx', '_moves', '_neighbors', '_distances', '_lineKeys',
+        '_h', '_lc', '_history',
+    )
+
+    DEFAULT_SIZE = 4
+
+    DEFAULT_NULL = 0
+
+    # tile codes (goal indices) by flat cell index i * size + j
+    _grid: array
+
+    _size: int
+
+    _null: T@__init__
 
-    _size: int = 4
+    # goal and elements never change, so they are shared by copies
+    _goal: tuple[tuple[T@__init__, ...], ...]
 
-    _null: T@__init__ = 0
+    _elements: tuple[T@__init__, ...]
 
-    _goal: list[list[T@__init__]]
+    # flat cell index by tile code
+    _index: array
 
-    _elements: list[T@__init__]
+    _code: dict[T@__init__, int]
 
-    _history: list[Move]
+    _bits: int
+
+    _packed: int
+
+    _goalPacked: int
+
+    _nullCode: int
+
+    _nullIdx: int
+
+    _moves: tuple[tuple[int, ...], ...]
+
+    _neighbors: tuple[tuple[tuple[int, int], ...], ...]
+
+    _distances: tuple[tuple[int, ...], ...]
+
+    _lineKeys: tuple[tuple[tuple[int, ...], ...], ...]
+
+    _h: int
+
+    _lc: int
+
+    # moves in integer form, one byte each
+    _history: bytearray
 
     @property
     def null(self) -> T@__init__:
         return self._null
 
+    @property
+    def size(self) -> int:
+        return self._size
+
     @property
     def elements(self) -> list[T@__init__]:
-        return self._elements[:]
+        return list(self._elements)
 
     @property
     def history(self) -> list[Move]:
-        return self._history
+        return [MOVES[k] for k in self._history]
+
+    @property
+    def packed(self) -> int:
+        return self._packed
 
     def __init__(
         self,
@@ -144,30 +321,23 @@ class Puzzle:
             The element representing the null tile. Preferably the same type
             as other elements. Default None (will resort to 0).
         """
-        self._history = []
-
-        if null is not None:
-            self._null = null
-
-        if grid is not None:
-            self._size = len(grid)
+        self._history = bytearray()
+        self._null = null if null is not None else Puzzle.DEFAULT_NULL
 
         if size is not None:
             self._size = size
+        elif grid is not None:
+            self._size = len(grid)
+        else:
+            self._size = Puzzle.DEFAULT_SIZE
 
         if goal is None:
-            self._goal = []
-            for i in range(self._size):
-                self._goal.append([])
-                for j in range(self._size):
-                    self._goal[i].append(i * self._size + j + 1)
-            # put null element on bottom right corner
-            self._goal[-1][-1] = self._null
+            self._goal = defaultGoal(self._size, self._null)
         else:
-            self._goal = [[goal[i][j]
-                           for j in range(self._size)] for i in range(self._size)]
+            self._goal = tuple(tuple(goal[i][j]
+                                     for j in range(self._size)) for i in range(self._size))
 
-        self._elements = [x for row in self._goal for x in row]
+        self._elements = tuple(x for row in self._goal for x in row)
 
         if len(set(self._elements)) != len(self._elements):
             raise ValueError('Puzzle goal tiles are not unique.')
@@ -177,20 +347,12 @@ class Puzzle:
 
         if grid is None:
             # no grid specified, randomize
-            self._grid = [[0] * self._size for _ in range(self._size)]
-
-            els = self._elements[:]
+            els = list(self._elements)
             random.shuffle(els)
-
-            for i in range(self._size):
-                for j in range(self._size):
-                    self._grid[i][j] = els.pop()
         else:
             # enforce correct size
-            self._grid = [[grid[i][j]
-                           for j in range(self._size)] for i in range(self._size)]
-
-            els = [x for row in self._grid for x in row]
+            els = [grid[i][j]
+                   for i in range(self._size) for j in range(self._size)]
 
             if len(set(els)) != len(els):
                 raise ValueError('Puzzle tiles are not unique.')
@@ -198,6 +360,41 @@ class Puzzle:
             if set(els) != set(self._elements):
                 raise ValueError('Puzzle elements not present in goal state.')
 
+        # tiles are stored and packed by their goal index, so the goal
+        # state is simply the ascending sequence of indices
+        self._code = {el: k for k, el in enumerate(self._elements)}
+        self._bits = max(4, (len(self._elements) - 1).bit_length())
+        self._goalPacked = self.pack(self._goal)
+        self._nullCode = self._code[self._null]
+
+        typecode = 'B' if len(els) <= 0x100 else 'H'
+        self._grid = array(typecode, [self._code[el] for el in els])
+        self._index = array(typecode, bytes(self._grid.itemsize * len(els)))
+
+        self._moves = moveTable(self._size)
+        self._neighbors = neighborTable(self._size)
+        self._distances = distanceTable(self._size)
+        self._lineKeys = lineKeyTable(self._size, self._nullCode)
+
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """Rebuild everything derived from the grid."""
+        self._packed = 0
+        self._h = 0
+        for k, code in enumerate(self._grid):
+            self._index[code] = k
+            self._packed |= code << (self._bits * k)
+            if code != self._nullCode:
+                self._h += self._distances[code][k]
+
+        self._nullIdx = self._index[self._nullCode]
+
+        self._lc = 0
+        for line in range(self._size):
+            self._lc += self.lineConflicts(line, False)
+            self._lc += self.lineConflicts(line, True)
+
     def pos(self, el: T) -> tuple[int, int]:
         """Find the position of a given element
 
@@ -211,79 +408,154 @@ class Puzzle:
         tuple[int, int]
             Tuple of index, in order of the array notation [i][j]
         """
-        for i in range(self._size):
-            for j in range(self._size):
-                if self._grid[i][j] == el:
-                    return (i, j)
-        raise ValueError(f'Element {el} not found in puzzle.')
+        try:
+            return divmod(self._index[self._code[el]], self._size)
+        except KeyError:
+            raise ValueError(f'Element {el} not found in puzzle.') from None
 
-    def isMoveable(self, direction: Move):
+    def isMoveable(self, direction: Move | int):
         """Check if moving in the given direction is possible.
 
         Possible = will change the state of the puzzle.
 
         Parameters
         ----------
-        direction : Move
-            The direction of the move.
+        direction : Move or int
+            The direction of the move, or its index in MOVES.
 
         Returns
         -------
         bool
         """
-        i, j = self.pos(self._null)
-        if direction == Move.UP and i > 0:
-            return True
-        elif direction == Move.DOWN and i < self._size - 1:
-            return True
-        elif direction == Move.LEFT and j > 0:
-            return True
-        elif direction == Move.RIGHT and j < self._size - 1:
-            return True
-        return False
-
-    def move(self, direction: Move) -> bool:
+        if isinstance(direction, Move):
+            direction = MOVEINDEX[direction]
+
+        return self._moves[self._nullIdx][direction] >= 0
+
+    def neighbors(self) -> tuple[tuple[int, int], ...]:
+        """Get the possible moves.
+
+        Returns
+        -------
+        tuple[tuple[int, int], ...]
+            Pairs of move index (in MOVES) and the cell the null
+            tile moves to, as a flat index i * size + j.
+        """
+        return self._neighbors[self._nullIdx]
+
+    def move(self, direction: Move | int) -> bool:
         """Move the puzzle
 
         Parameters
         ----------
-        direction : Move
-            The direction of the move.
+        direction : Move or int
+            The direction of the move, or its index in MOVES.
 
         Returns
         -------
         bool
             Whether the move changed the state of the puzzle.
         """
-        if not self.isMoveable(direction):
-            return False
-
-        i, j = self.pos(self._null)
+        if isinstance(direction, Move):
+            direction = MOVEINDEX[direction]
 
-        if direction == Move.UP:
-            self.swap((i, j), (i - 1, j))
-        elif direction == Move.DOWN:
-            self.swap((i, j), (i + 1, j))
-        elif direction == Move.LEFT:
-            self.swap((i, j), (i, j - 1))
-        elif direction == Move.RIGHT:
-            self.swap((i, j), (i, j + 1))
+        nk = self._moves[self._nullIdx][direction]
+        if nk < 0:
+            return False
 
+        self._slide(nk)
         self._history.append(direction)
         return True
 
+    def undo(self) -> Move:
+        """Undo the last move.
+
+        Returns
+        -------
+        Move
+            The undone move.
+        """
+        direction = self._history.pop()
+        self._slide(self._moves[self._nullIdx][direction ^ 2])
+        return MOVES[direction]
+
+    def _slide(self, nk: int) -> None:
+        """Slide the tile on cell nk into the null cell."""
+        k = self._nullIdx
+        i, j = divmod(k, self._size)
+        ni, nj = divmod(nk, self._size)
+        code = self._grid[nk]
+
+        dist = self._distances[code]
+        self._h += dist[k] - dist[nk]
+
+        # a vertical move changes two rows, a horizontal one two
+        # columns, the order within the other lines stays the same
+        vertical = i != ni
+        a, b = (i, ni) if vertical else (j, nj)
+        self._lc -= self.lineConflicts(a, not vertical) + \
+            self.lineConflicts(b, not vertical)
+
+        # both fields change by the difference of the two codes
+        self._packed += (code - self._nullCode) * \
+            ((1 << self._bits * k) - (1 << self._bits * nk))
+
+        self._grid[k] = code
+        self._grid[nk] = self._nullCode
+        self._index[code] = k
+        self._index[self._nullCode] = nk
+        self._nullIdx = nk
+
+        self._lc += self.lineConflicts(a, not vertical) + \
+            self.lineConflicts(b, not vertical)
+
     def offsetTiles(self) -> int:
         """Count the number of tiles not in position."""
         count = 0
-        for i in range(self._size):
-            for j in range(self._size):
-                if self._grid[i][j] != self._goal[i][j] and self._grid[i][j] != self._null:
-                    count += 1
+        for k, code in enumerate(self._grid):
+            if code != k and code != self._nullCode:
+                count += 1
         return count
 
+    def manhattan(self) -> int:
+        """Sum the Manhattan distance of every tile to its goal position.
+
+        The sum is computed once on initialization and updated on
+        every move, so this runs in constant time.
+        """
+        return self._h
+
+    def lineConflicts(self, line: int, column: bool = False) -> int:
+        """Count the extra moves forced by linear conflicts in a line.
+
+        Parameters
+        ----------
+        line : int
+            Index of the row or column.
+        column : bool, default False
+            Whether the line is a column.
+        """
+        size = self._size
+        if column:
+            cells = self._grid[line::size]
+        else:
+            cells = self._grid[line * size:(line + 1) * size]
+
+        table = self._lineKeys[column][line]
+        return orderConflicts(
+            tuple([table[code] for code in cells if table[code] >= 0]))
+
+    def heuristic(self) -> int:
+        """Estimate the number of moves left, never overestimating.
+
+        Sum of the Manhattan distance and linear conflicts of all
+        rows and columns, both kept up to date on every move.
+        """
+        return self._h + self._lc
+
     def cost(self) -> int:
         """Calculate the heuristic cost of the puzzle."""
-        return len(self._history) + self.offsetTiles()
+        return len(self._history) + self._h + self._lc
 
     def offset(self, el: T) -> int:
         """Calculate the "offset value" of a tile.
@@ -305,13 +577,30 @@ class Puzzle:
         Total = Sum of offset value for all tiles + X
         With (i,j) referring to the position index of the null tile
         X = 1 if i + j is even, 0 otherwise
+
+        The sum of offset values is the number of inversions of the
+        tile codes in cell order, counted with a Fenwick tree in
+        O(n log n) for n cells.
         """
-        stat = 0
-        for el in self._elements:
-            stat += self.offset(el)
+        # tree[i] holds counts of codes seen so far, over a range of
+        # codes ending at i - 1 sized by the lowest set bit of i
+        n = len(self._grid)
+        tree = [0] * (n + 1)
 
-        inull, jnull = self.pos(self._null)
-        if (inull + jnull) % 2 != 0:
+        stat = 0
+        for code in reversed(self._grid):
+            # codes smaller than this one, placed after it
+            i = code
+            while i > 0:
+                stat += tree[i]
+                i &= i - 1
+
+            i = code + 1
+            while i <= n:
+                tree[i] += 1
+                i += i & -i
+
+        if (self._nullIdx // self._size + self._nullIdx % self._size) % 2 != 0:
             stat += 1
 
         return stat
@@ -320,27 +609,98 @@ class Puzzle:
         return self.totalOffset() % 2 == 0
 
     def isSolved(self):
-        return self._grid == self._goal
+        return self._packed == self._goalPacked
+
+    def pack(self, grid: list[list[T]]) -> int:
+        """Pack a grid of this puzzle's elements into an integer.
+
+        See the packed attribute for the layout.
+        """
+        packed = 0
+        for i in range(self._size):
+            for j in range(self._size):
+                k = i * self._size + j
+                packed |= self._code[grid[i][j]] << (self._bits * k)
+        return packed
 
     def swap(self, a: tuple[int, int], b: tuple[int, int]) -> None:
-        self._grid[a[0]][a[1]], self._grid[b[0]][b[1]
-                                                 ] = self._grid[b[0]][b[1]], self._grid[a[0]][a[1]]
+        """Swap any two tiles.
+
+        Unlike move(), this rebuilds the packed state and heuristic
+        from scratch.
+        """
+        ka = a[0] * self._size + a[1]
+        kb = b[0] * self._size + b[1]
+        self._grid[ka], self._grid[kb] = self._grid[kb], self._grid[ka]
+        self._refresh()
 
     def copy(self) -> Puzzle:
-        new = Puzzle(self._grid)
+        """Copy the puzzle without revalidating it.
+
+        Parts which never change after initialization are shared
+        with the copy instead of being rebuilt.
+        """
+        new = object.__new__(Puzzle)
+        new._size = self._size
+        new._null = self._null
+        new._goal = self._goal
+        new._elements = self._elements
+        new._code = self._code
+        new._bits = self._bits
+        new._goalPacked = self._goalPacked
+        new._nullCode = self._nullCode
+        new._moves = self._moves
+        new._neighbors = self._neighbors
+        new._distances = self._distances
+        new._lineKeys = self._lineKeys
+        new._grid = self._grid[:]
+        new._index = self._index[:]
+        new._nullIdx = self._nullIdx
+        new._packed = self._packed
+        new._h = self._h
+        new._lc = self._lc
         new._history = self._history[:]
         return new
 
+    def branch(self, direction: Move | int) -> Puzzle | None:
+        """Copy the puzzle and move the copy.
+
+        Parameters
+        ----------
+        direction : Move or int
+            The direction of the move, or its index in MOVES.
+
+        Returns
+        -------
+        Puzzle or None
+            The moved copy, or None if the move would not change
+            the state of the puzzle.
+        """
+        if not self.isMoveable(direction):
+            return None
+
+        new = self.copy()
+        new.move(direction)
+        return new
+
     def serialize(self, rowDelim: str = ';', colDelim: str = ':') -> str:
+        n = self._size
         return rowDelim.join([
             colDelim.join([
-                str(e) if e != self._null else '-'
-                for e in r
-            ]) for r in self._grid
+                str(self._elements[c]) if c != self._nullCode else '-'
+                for c in self._grid[i * n:(i + 1) * n]
+            ]) for i in range(n)
         ])
 
     def __eq__(self, __o: object) -> bool:
-        return self._grid == __o._grid
+        if not isinstance(__o, Puzzle):
+            return NotImplemented
+        # the packed states only match for the same tiles if the
+        # goals match too
+        return self._packed == __o._packed and self._elements == __o._elements
+
+    def __hash__(self) -> int:
+        return hash(self._packed)
 
     def __lt__(self, __o: object) -> bool:
         return self.cost() < __o.cost()
@@ -359,7 +719,7 @@ class Puzzle:
         """Load puzzle from a file."""
         with open(fname) as f:
             if null is None:
-                null = Puzzle._null
+                null = Puzzle.DEFAULT_NULL
 
             grid: list[list[T]] = []
             size = -1
@@ -368,7 +728,7 @@ class Puzzle:
                 if len(line) > 0:
                     row = [
                         key(x) if x != fnull else null
-                        for x in filter(None, re.split('\s', line))
+                        for x in line.split()
                     ]
 
                     if size == -1:
@@ -0,0 +1,250 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""Puzzle 15 Fast Solver
+
+IDA* with Manhattan distance and linear conflict heuristic,
+specialized for the 4x4 puzzle with the whole search in C.
+States are packed like puzzle.Puzzle.packed (4 bits per cell,
+holding the goal index of its tile) into a uint64_t.
+
+Moves are encoded as in solver_core, i.e. indices of
+puzzle.MOVES.
+
+Notes
+-----
+Requires Cython. solver.py builds it with pyximport when solving
+a 4x4 puzzle, so no separate build step is needed.
+
+See Also
+--------
+solver_core.solve
+"""
+from libc.stdint cimport uint64_t
+
+cdef enum:
+    SIZE = 4
+    CELLS = 16
+    MAXDEPTH = 128
+
+# Manhattan distance of a tile (by goal index) on a cell to its goal
+cdef int GOAL_MH[CELLS][CELLS]
+
+# cell the null tile moves to, -1 if impossible, indexed by [cell][move]
+cdef int MOVE_TO[CELLS][4]
+
+
+cdef void _init_tables():
+    cdef int di[4]
+    cdef int dj[4]
+    cdef int t, k, m, ni, nj
+    di[:] = [-1, 0, 1, 0]
+    dj[:] = [0, 1, 0, -1]
+
+    for t in range(CELLS):
+        for k in range(CELLS):
+            GOAL_MH[t][k] = abs(t // SIZE - k // SIZE) + abs(t % SIZE - k % SIZE)
+
+    for k in range(CELLS):
+        for m in range(4):
+            ni = k // SIZE + di[m]
+            nj = k % SIZE + dj[m]
+            if 0 <= ni < SIZE and 0 <= nj < SIZE:
+                MOVE_TO[k][m] = ni * SIZE + nj
+            else:
+                MOVE_TO[k][m] = -1
+
+
+_init_tables()
+
+
+cdef inline int tile(uint64_t state, int k) noexcept nogil:
+    return <int>((state >> (4 * k)) & 0xF)
+
+
+cdef inline uint64_t move_state(uint64_t state, int null_idx, int new_idx) noexcept nogil:
+    """Slide the tile on new_idx into the null cell null_idx."""
+    cdef uint64_t a = (state >> (4 * null_idx)) & 0xF
+    cdef uint64_t b = (state >> (4 * new_idx)) & 0xF
+    state &= ~((<uint64_t>0xF << (4 * null_idx)) | (<uint64_t>0xF << (4 * new_idx)))
+    return state | (a << (4 * new_idx)) | (b << (4 * null_idx))
+
+
+cdef int null_pos(uint64_t state, int null) noexcept nogil:
+    cdef int k
+    for k in range(CELLS):
+        if tile(state, k) == null:
+            return k
+    return -1
+
+
+cdef int line_conflicts(uint64_t state, int null, int line, bint column) noexcept nogil:
+    """Extra moves forced by linear conflicts in a row or column.
+
+    See puzzle.orderConflicts.
+    """
+    cdef int keys[SIZE]
+    cdef int longest[SIZE]
+    cdef int n = 0, best = 0
+    cdef int x, t, a, b
+
+    for x in range(SIZE):
+        t = tile(state, x * SIZE + line if column else line * SIZE + x)
+        if t == null:
+            continue
+        if column and t % SIZE == line:
+            keys[n] = t // SIZE
+            n += 1
+        elif not column and t // SIZE == line:
+            keys[n] = t % SIZE
+            n += 1
+
+    for a in range(n):
+        longest[a] = 1
+        for b in range(a):
+            if keys[b] < keys[a] and longest[b] >= longest[a]:
+                longest[a] = longest[b] + 1
+        if longest[a] > best:
+            best = longest[a]
+    return 2 * (n - best)
+
+
+cdef int heuristic(uint64_t state, int null) noexcept nogil:
+    cdef int h = 0
+    cdef int k, t
+    for k in range(CELLS):
+        t = tile(state, k)
+        if t != null:
+            h += GOAL_MH[t][k]
+    for k in range(SIZE):
+        h += line_conflicts(state, null, k, False)
+        h += line_conflicts(state, null, k, True)
+    return h
+
+
+cdef int _ida(uint64_t root, int null, unsigned char *path,
+              unsigned long long *count) noexcept nogil:
+    """Run IDA* from root, writing the moves into path.
+
+    Returns the number of moves, or -1 if no solution within
+    MAXDEPTH moves is found.
+    """
+    cdef uint64_t states[MAXDEPTH + 1]
+    cdef int hs[MAXDEPTH + 1]
+    cdef int nulls[MAXDEPTH + 1]
+    cdef int tries[MAXDEPTH + 1]
+    cdef uint64_t goal = 0, state, new
+    cdef int k, nk, m, t, h, nh, f, a, b, depth, bound, minimum
+    cdef bint column
+
+    for k in range(CELLS):
+        goal |= (<uint64_t>k) << (4 * k)
+
+    count[0] = 1
+    if root == goal:
+        return 0
+
+    h = heuristic(root, null)
+    bound = h
+    while bound <= MAXDEPTH:
+        states[0] = root
+        hs[0] = h
+        nulls[0] = null_pos(root, null)
+        tries[0] = 0
+
+        minimum = -1
+        depth = 0
+        while depth >= 0:
+            m = tries[depth]
+            if m == 4:
+                depth -= 1
+                continue
+            tries[depth] += 1
+
+            # undoing the last move gives a node already on the path
+            if depth > 0 and m == (path[depth - 1] ^ 2):
+                continue
+
+            k = nulls[depth]
+            nk = MOVE_TO[k][m]
+            if nk < 0:
+                continue
+
+            state = states[depth]
+            new = move_state(state, k, nk)
+            count[0] += 1
+
+            # the tile on nk slides into the null cell k
+            t = tile(state, nk)
+            nh = hs[depth] + GOAL_MH[t][k] - GOAL_MH[t][nk]
+
+            # only the two rows (or columns) it moves between change
+            column = m % 2 == 1
+            if column:
+                a = k % SIZE
+                b = nk % SIZE
+            else:
+                a = k // SIZE
+                b = nk // SIZE
+            nh += line_conflicts(new, null, a, column) \
+                + line_conflicts(new, null, b, column) \
+                - line_conflicts(state, null, a, column) \
+                - line_conflicts(state, null, b, column)
+
+            f = depth + 1 + nh
+            if f > bound:
+                if minimum == -1 or f < minimum:
+                    minimum = f
+                continue
+
+            path[depth] = m
+            if new == goal:
+                return depth + 1
+
+            depth += 1
+            states[depth] = new
+            hs[depth] = nh
+            nulls[depth] = nk
+            tries[depth] = 0
+
+        if minimum == -1:
+            return -1
+        bound = minimum
+
+    return -1
+
+
+def solve_15(bytes initial, int null=15):
+    """Solve a 4x4 puzzle.
+
+    Parameters
+    ----------
+    initial : bytes
+        Goal index of the tile on each cell, in row-major order.
+        Must be solveable.
+    null : int, default 15
+        Goal index of the null tile.
+
+    Returns
+    -------
+    tuple[list[int], int]
+        The sequence of moves and the number of nodes branched.
+        Raises ValueError if no solution within MAXDEPTH moves is
+        found, so it can't be mistaken for an already solved one.
+    """
+    if len(initial) != CELLS:
+        raise ValueError('Puzzle must have 16 cells.')
+
+    cdef uint64_t root = 0
+    cdef unsigned char path[MAXDEPTH]
+    cdef unsigned long long count = 0
+    cdef int k, n
+
+    for k in range(CELLS):
+        root |= (<uint64_t>initial[k]) << (4 * k)
+
+    with nogil:
+        n = _ida(root, null, path, &count)
+
+    if n < 0:
+        raise ValueError(f'No solution within {MAXDEPTH} moves.')
+
+    return [path[k] for k in range(n)], count
@@ -3,7 +3,9 @@
 """Puzzle 15 Solver
 
 Solve Puzzle 15 using Branch and Bound Algorithm
-with offset tile count heuristics. Puzzle will be
+with Manhattan distance and linear conflict heuristics,
+in the form of IDA* (iterative deepening A*), so memory
+use only grows with the solution length. Puzzle will be
 generated randomly, or can be loaded from a file.
 
 Example
@@ -31,21 +33,25 @@ Algorithm reference:
 `R. Munir et al <https://informatika.stei.itb.ac.id/~rinaldi.munir/Stmik/2020-2021/Algoritma-Branch-and-Bound-2021-Bagian1.pdf>` 
 
 Please also note that the structure used here is not optimized
-for speed.
+for speed. If Cython is installed, 4x4 puzzles are solved by
+the C search in puzzle15_fast instead. Otherwise if numba is
+installed, puzzles of up to 16 cells are solved by the compiled
+search in solver_core.
 
 See Also
 --------
 puzzle.Puzzle
+puzzle15_fast.solve_15
+solver_core.solve
 
 """
 import argparse
+import math
 import sys
-from queue import PriorityQueue
 from time import perf_counter
-from types import NoneType
 
 from console import enable_vt_mode
-from puzzle import Puzzle, Move
+from puzzle import Puzzle, Move, MOVES
 import view
 
 # parse arguments
@@ -84,12 +90,79 @@ print(f'\nTotal + X = {root.totalOffset()}')
 
 # main algorithm
 
-queue: PriorityQueue[Puzzle] = PriorityQueue()
-visited: dict[str, NoneType] = {}
+# the compiled searches are only loaded when they would be used,
+# and before timing, with the pyximport hook removed right after
+solveable = root.isSolveable()
+
+puzzle15_fast = None
+if solveable and root.size == 4:
+    try:
+        import pyximport
+    except ImportError:
+        pass
+    else:
+        importers = pyximport.install(language_level=3)
+        try:
+            import puzzle15_fast
+        except ImportError:
+            pass
+        finally:
+            pyximport.uninstall(*importers)
+
+solver_core = None
+if solveable and puzzle15_fast is None and len(root.elements) <= 16:
+    try:
+        import numpy as np
+        import solver_core
+    except ImportError:
+        pass
+
+FOUND = -1
+
+# progress is only written every 1024 nodes
+logProgress = not args.verbose
+PROGRESS_MASK = 0x3FF
+writeOut = sys.stdout.write
+progressFormat = '\033[2K\033[1G{:,}'.format
+
+
+def search(puzzle: Puzzle, bound: int, back: int) -> int | float:
+    """Search depth-first below puzzle for nodes within the bound.
+
+    The puzzle is moved in place, and left at the goal state if
+    found. back is the move undoing the last one, which is never
+    taken.
+
+    Returns FOUND, or the smallest cost exceeding the bound.
+    """
+    global count
+
+    f = puzzle.cost()
+    if f > bound:
+        return f
+    if puzzle.isSolved():
+        return FOUND
+
+    minimum = math.inf
+    for move, _ in puzzle.neighbors():
+        if move == back:
+            continue
+
+        puzzle.move(move)
+        count += 1
+
+        if logProgress and count & PROGRESS_MASK == 0:
+            writeOut(progressFormat(count))
+            sys.stdout.flush()
+
+        t = search(puzzle, bound, move ^ 2)
+        if t == FOUND:
+            return FOUND
+        minimum = min(minimum, t)
+        puzzle.undo()
+
+    return minimum
 
-if root.isSolveable():
-    queue.put(root)
-    visited[root.serialize()] = None
 
 view.displayHeader('Solve')
 
@@ -100,27 +173,41 @@ if not args.verbose:
 
 startTime = perf_counter()
 
-while not queue.empty():
-    puzzle = queue.get()
-
-    if puzzle.isSolved():
-        break
-
-    for move in Move:
-        new = puzzle.copy()
-        if new.move(move):
-            key = new.serialize()
-            if key not in visited:
-                queue.put(new)
-                visited[key] = None
-                count += 1
-
-                if not args.verbose:
-                    sys.stdout.write(f'\033[2K\033[1G{count:,}')
-                    sys.stdout.flush()
+solution: list[Move] = None
+
+if not solveable:
+    pass
+elif puzzle15_fast is not None:
+    moves, count = puzzle15_fast.solve_15(
+        bytes((root.packed >> 4 * k) & 0xF for k in range(16)),
+        root.elements.index(root.null))
+    solution = [MOVES[m] for m in moves]
+elif solver_core is not None:
+    moves, count = solver_core.solve(
+        np.uint64(root.packed), root.size, root.elements.index(root.null))
+    solution = [MOVES[m] for m in moves]
+else:
+    # iterative deepening, each round searching depth-first for
+    # nodes not exceeding the bound, and raising the bound to the
+    # smallest cost exceeding it. Memory is only the current path.
+    puzzle = root.copy()
+    bound = puzzle.cost()
+
+    while True:
+        t = search(puzzle, bound, -1)
+        if t == FOUND:
+            solution = puzzle.history
+            break
+        if t == math.inf:
+            break
+        bound = t
 
 endTime = perf_counter()
 
+if logProgress:
+    writeOut(progressFormat(count))
+    sys.stdout.flush()
+
 if args.verbose:
     print(f'Nodes branched:\n{count:,}')
 else:
@@ -133,12 +220,12 @@ print(f'{endTime - startTime:.4f}s')
 
 view.displayHeader('Solution')
 
-if queue.empty():
+if solution is None:
     print('The puzzle cannot be solved.')
 else:
-    print(f'Number of moves: {len(puzzle.history)}')
+    print(f'Number of moves: {len(solution)}')
     print('Sequence:')
-    view.displayList(puzzle.history, lambda x: x.value)
+    view.displayList(solution, lambda x: x.value)
 
     view.displayHeader('Step by Step')
-    Puzzle.showMoves(root, puzzle.history, not args.verbose)
+    Puzzle.showMoves(root, solution, not args.verbose)
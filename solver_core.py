@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Puzzle 15 Solver Core
+
+Branch and Bound search (IDA*) with Manhattan distance and
+linear conflict heuristic, compiled with Numba. Works on packed states (see
+puzzle.Puzzle.packed), i.e. each cell holds the goal index of
+its tile in 4 bits, so only puzzles of up to 16 cells
+(a state must fit in a uint64) are supported.
+
+Moves are encoded as integers in the order of puzzle.Move,
+i.e. 0 = Up, 1 = Right, 2 = Down, 3 = Left, so the opposite
+of move m is m ^ 2.
+
+Notes
+-----
+Requires numba (and numpy). solve is compiled on import and
+cached on disk, so only the first run pays the compilation
+time, and it is never counted in the search time.
+
+See Also
+--------
+puzzle.Puzzle
+"""
+import numpy as np
+from numba import njit
+
+BITS = np.uint64(4)
+MASK = np.uint64(0xF)
+
+# row and column deltas of the null tile, indexed by move
+DI = (-1, 0, 1, 0)
+DJ = (0, 1, 0, -1)
+
+
+@njit(cache=True)
+def pack(tiles):
+    state = np.uint64(0)
+    for k in range(tiles.size):
+        state |= np.uint64(tiles[k]) << (BITS * np.uint64(k))
+    return state
+
+
+@njit(cache=True)
+def tile(state, k):
+    return np.int64((state >> (BITS * np.uint64(k))) & MASK)
+
+
+@njit(cache=True)
+def slide(state, a, b):
+    """Swap the tiles on cells a and b."""
+    sa = BITS * np.uint64(a)
+    sb = BITS * np.uint64(b)
+    va = (state >> sa) & MASK
+    vb = (state >> sb) & MASK
+    state &= ~((MASK << sa) | (MASK << sb))
+    return state | (va << sb) | (vb << sa)
+
+
+@njit(cache=True)
+def null_pos(state, size, null):
+    for k in range(size * size):
+        if tile(state, k) == null:
+            return k
+    return -1
+
+
+@njit(cache=True)
+def distance(t, k, size):
+    """Manhattan distance of tile t on cell k to its goal cell."""
+    return abs(k // size - t // size) + abs(k % size - t % size)
+
+
+@njit(cache=True)
+def manhattan(state, size, null):
+    h = 0
+    for k in range(size * size):
+        t = tile(state, k)
+        if t != null:
+            h += distance(t, k, size)
+    return h
+
+
+@njit(cache=True)
+def line_conflicts(state, size, null, line, column):
+    """Extra moves forced by linear conflicts in a row or column.
+
+    See puzzle.orderConflicts.
+    """
+    keys = np.empty(size, dtype=np.int64)
+    n = 0
+    for x in range(size):
+        k = x * size + line if column else line * size + x
+        t = tile(state, k)
+        if t == null:
+            continue
+        if column and t % size == line:
+            keys[n] = t // size
+            n += 1
+        elif not column and t // size == line:
+            keys[n] = t % size
+            n += 1
+
+    # longest increasing subsequence of goal positions
+    longest = np.ones(n, dtype=np.int64)
+    best = 0
+    for a in range(n):
+        for b in range(a):
+            if keys[b] < keys[a] and longest[b] >= longest[a]:
+                longest[a] = longest[b] + 1
+        best = max(best, longest[a])
+    return 2 * (n - best)
+
+
+@njit(cache=True)
+def heuristic(state, size, null):
+    h = manhattan(state, size, null)
+    for line in range(size):
+        h += line_conflicts(state, size, null, line, False)
+        h += line_conflicts(state, size, null, line, True)
+    return h
+
+
+# compiled on import with an explicit signature, so the first
+# call is not timed with compilation, and any state fits a uint64
+@njit('Tuple((uint8[::1], int64))(uint64, int64, int64)', cache=True)
+def solve(root, size, null):
+    """Solve a packed puzzle with IDA*.
+
+    Each round searches depth-first for nodes not exceeding the
+    bound, then raises the bound to the smallest cost exceeding
+    it. The path is kept in fixed arrays instead of recursion.
+
+    Parameters
+    ----------
+    root : uint64
+        The packed starting state. Must be solveable.
+    size : int
+        Size of the puzzle, at most 4.
+    null : int
+        Goal index of the null tile.
+
+    Returns
+    -------
+    tuple[ndarray of uint8, int]
+        The sequence of moves and the number of nodes branched.
+    """
+    goal = pack(np.arange(size * size).astype(np.uint8))
+    count = 1
+    if root == goal:
+        return np.empty(0, dtype=np.uint8), count
+
+    h = heuristic(root, size, null)
+    bound = h
+    while True:
+        # node at each depth, and the next move to try from it
+        states = np.empty(bound + 1, dtype=np.uint64)
+        hs = np.empty(bound + 1, dtype=np.int64)
+        nulls = np.empty(bound + 1, dtype=np.int64)
+        tries = np.zeros(bound + 1, dtype=np.int64)
+        path = np.empty(bound + 1, dtype=np.uint8)
+
+        states[0] = root
+        hs[0] = h
+        nulls[0] = null_pos(root, size, null)
+
+        minimum = -1
+        depth = 0
+        while depth >= 0:
+            m = tries[depth]
+            if m == 4:
+                depth -= 1
+                continue
+            tries[depth] += 1
+
+            # undoing the last move gives a node already on the path
+            if depth > 0 and m == path[depth - 1] ^ 2:
+                continue
+
+            k = nulls[depth]
+            i, j = k // size, k % size
+            ni, nj = i + DI[m], j + DJ[m]
+            if ni < 0 or ni >= size or nj < 0 or nj >= size:
+                continue
+
+            state = states[depth]
+            nk = ni * size + nj
+            new = slide(state, k, nk)
+            count += 1
+
+            # the tile on nk slides into the null cell k
+            t = tile(state, nk)
+            nh = hs[depth] + distance(t, k, size) - distance(t, nk, size)
+
+            # only the two rows (or columns) it moves between change
+            if ni != i:
+                a, b, column = i, ni, False
+            else:
+                a, b, column = j, nj, True
+            nh += line_conflicts(new, size, null, a, column) \
+                + line_conflicts(new, size, null, b, column) \
+                - line_conflicts(state, size, null, a, column) \
+                - line_conflicts(state, size, null, b, column)
+
+            f = depth + 1 + nh
+            if f > bound:
+                if minimum == -1 or f < minimum:
+                    minimum = f
+                continue
+
+            path[depth] = m
+            if new == goal:
+                return path[:depth + 1].copy(), count
+
+            depth += 1
+            states[depth] = new
+            hs[depth] = nh
+            nulls[depth] = nk
+            tries[depth] = 0
+
+        if minimum == -1:
+            return np.empty(0, dtype=np.uint8), count
+        bound = minimum
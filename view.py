@@ -24,9 +24,9 @@ def displayHeader(title: str, sep: str = '=') -> None:
 
 
 def displayList(lst: list[T], key: Callable[[T], Any] = None) -> None:
-    maxSpace = len(str(len(lst)))
+    spacing = len(str(len(lst))) + 2
+    fmt = f"{{:{spacing}}}. {{}}".format
     for i in range(len(lst)):
         x = key(lst[i]) if key else lst[i]
-        spacing = maxSpace + 2
-        print(f"{i + 1:{spacing}}. {x}")
+        print(fmt(i + 1, x))
     print('')